@@ -7,80 +7,131 @@ from __future__ import annotations
 
 import argparse
 import datetime
+import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pprint import pprint
 
-import requests
 from termcolor import colored
 
+from github_client import GitHubClient
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Up to 100 PRs and their mergeability in one request
+SEARCH_QUERY = """
+query ($query: String!, $cursor: String) {
+  search(query: $query, type: ISSUE, first: 100, after: $cursor) {
+    issueCount
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    nodes {
+      ... on PullRequest {
+        number
+        title
+        url
+        mergeable
+      }
+    }
+  }
+}
+"""
+
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
-def bleep(url):
-    """Call the API and return JSON and next URL"""
-    # print(url)
-    r = requests.get(url, timeout=10)
-    # pprint(r)
-
-    try:
-        next_url = r.links["next"]["url"]
-    except KeyError:
-        next_url = None
-
-    if int(r.headers["X-Ratelimit-Remaining"]) < 12:
-        print("r.status_code", r.status_code)
-        print("X-Ratelimit-Limit", r.headers["X-Ratelimit-Limit"])
-        print("X-Ratelimit-Remaining", r.headers["X-Ratelimit-Remaining"])
-        print("X-RateLimit-Reset", r.headers["X-RateLimit-Reset"])
-        remaining_time = int(r.headers["X-RateLimit-Reset"]) - time.time()
-        print(remaining_time, "seconds")
-        print(remaining_time / 60, "minutes")
-        reset_time = datetime.datetime.fromtimestamp(
-            int(int(r.headers["X-RateLimit-Reset"]))
-        ).strftime("%Y-%m-%d %H:%M:%S")
-        print(reset_time)
-
-    if r.status_code == 200:
-        return r.json(), next_url
-
-    elif r.status_code == 403:
-        if int(r.headers["X-Ratelimit-Remaining"]) == 0:
-            eprint(colored("Rate limit exceeded", "red"))
-        sys.exit(403)
-
-    return None, None
-
-
-def get_prs(start_url):
-    issues = []
-
-    # Fetch all issues from GitHub
-    next_url = start_url
+def get_mergeable(client, pr_url, deadline):
+    """
+    GitHub works out mergeability in the background and returns null until
+    it's ready, so poll with exponential backoff until it's known or the
+    deadline in seconds passes. Returns True, False, or None if still unknown.
+    """
+    give_up = time.monotonic() + deadline
+    delay = 1
     while True:
-        data, next_url = bleep(next_url)
-        new_issues = data["items"]
-        print("total_count", data["total_count"])
+        pr_data = client.get(pr_url).json()
+        # pprint(pr_data)
+        mergeable = pr_data["mergeable"]
+        if mergeable is not None or time.monotonic() + delay > give_up:
+            return mergeable
+        time.sleep(delay)
+        delay *= 2
 
-        for issue in new_issues:
-            # pprint(issue)
-            pr_url = issue["pull_request"]["url"]
 
-            pr_data, _ = bleep(pr_url)
-            # pprint(pr_data)
-            if pr_data["mergeable"]:
+def get_prs(client, query, start, end, workers, deadline):
+    issues = []
+    unknown = []
+
+    # Fetch all issues from GitHub, split by date if there are over 1000,
+    # oldest updated first like sort:updated-asc
+    new_issues = client.search_issues(query, start, end, workers)
+    new_issues.sort(key=lambda issue: issue["updated_at"])
+    print("total_count", len(new_issues))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Fetch the PRs concurrently, map() gives them back in search order.
+        # Any still being computed are re-polled while the others are fetched.
+        pr_urls = [issue["pull_request"]["url"] for issue in new_issues]
+        pr_results = executor.map(
+            partial(get_mergeable, client, deadline=deadline), pr_urls
+        )
+
+        for issue, mergeable in zip(new_issues, pr_results):
+            if mergeable:
                 # print("mergeable:\t{}".format(issue["html_url"]))
                 pass
+            elif mergeable is None:
+                print(colored("unknown:\t{}".format(issue["html_url"]), "yellow"))
+                unknown.append(issue)
             else:
                 print(colored("unmergeable:\t{}".format(issue["html_url"]), "red"))
                 issues.append(issue)
 
-        if not next_url:
+    return issues, unknown
+
+
+def get_prs_graphql(client, query, url=GRAPHQL_URL):
+    """Like get_prs, but with one GraphQL search per 100 PRs"""
+    issues = []
+    unknown = []
+
+    cursor = None
+    while True:
+        r = client.post(
+            url,
+            json={
+                "query": SEARCH_QUERY,
+                "variables": {"query": query, "cursor": cursor},
+            },
+        )
+        data = r.json()
+        if "errors" in data:
+            eprint(colored(data["errors"], "red"))
+            sys.exit(1)
+
+        search = data["data"]["search"]
+        print("total_count", search["issueCount"])
+
+        for pr in search["nodes"]:
+            # MERGEABLE, CONFLICTING or UNKNOWN (still being worked out)
+            if pr["mergeable"] == "CONFLICTING":
+                print(colored("unmergeable:\t{}".format(pr["url"]), "red"))
+                issues.append(pr)
+            elif pr["mergeable"] == "UNKNOWN":
+                print(colored("unknown:\t{}".format(pr["url"]), "yellow"))
+                unknown.append(pr)
+
+        if not search["pageInfo"]["hasNextPage"]:
             break
+        cursor = search["pageInfo"]["endCursor"]
 
-    return issues
+    return issues, unknown
 
 
 if __name__ == "__main__":
@@ -91,19 +142,63 @@ if __name__ == "__main__":
     parser.add_argument(
         "-a", "--author", default="hugovk", help="Find PRs created by this user"
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of PRs to check at the same time",
+    )
+    parser.add_argument(
+        "-d",
+        "--deadline",
+        type=float,
+        default=60,
+        help="Seconds to keep re-checking PRs whose mergeability GitHub "
+        "is still working out",
+    )
+    parser.add_argument(
+        "-g",
+        "--graphql",
+        action="store_true",
+        help="Use GraphQL to check 100 PRs per request, "
+        "needs a token in GITHUB_TOOLS_TOKEN",
+    )
+    parser.add_argument(
+        "--graphql-url", default=GRAPHQL_URL, help="GraphQL endpoint to use"
+    )
     args = parser.parse_args()
 
-    # https://developer.github.com/v3/search/#search-issues
+    if args.graphql:
+        query = f"is:pr author:{args.author} sort:updated-asc is:open"
+        print(query)
 
-    start_url = (
-        f"https://api.github.com/search/issues?q=is:pr+author:{args.author}"
-        "+sort:updated-asc+is:open"
-    )
-    print(start_url)
+        with GitHubClient(os.environ["GITHUB_TOOLS_TOKEN"]) as client:
+            prs, unknown = get_prs_graphql(client, query, args.graphql_url)
+
+    else:
+        # https://developer.github.com/v3/search/#search-issues
+
+        query = f"is:pr author:{args.author} is:open"
+        print(query)
+
+        with GitHubClient(
+            os.environ.get("GITHUB_TOOLS_TOKEN"), pool_size=args.workers
+        ) as client:
+            prs, unknown = get_prs(
+                client,
+                query,
+                # Before GitHub launched, so everything
+                datetime.date(2008, 1, 1),
+                datetime.date.today(),
+                args.workers,
+                args.deadline,
+            )
 
-    prs = get_prs(start_url)
     pprint(prs)
 
     print(f"{len(prs)} total unmergeable PRs")
+    if unknown:
+        print(f"{len(unknown)} PRs with unknown mergeability")
 
 # End of file
@@ -7,117 +7,107 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
-from collections import defaultdict
+import os
+from typing import TextIO
 
-import jsonlines  # pip install jsonlines
+import numpy as np  # pip install numpy
 
+from snapshot import find_jsonl, load_timestamps
 
-def find_oldest(pull_requests: list[dict]) -> tuple[list[dict], str]:
-    # Find oldest
-    oldest = pull_requests[0]["created_at"]
-    new_pull_requests = []
-    for pr in pull_requests:
-        if pr["created_at"] < oldest:
-            oldest = pr["created_at"]
 
-        # Keep only the data we need to speed up later processing
-        new_pull_requests.append(
-            {
-                k: v
-                for k, v in pr.items()
-                if k in ("created_at", "closed_at", "merged_at")
-            }
-        )
-    pull_requests = list(new_pull_requests)
-    return pull_requests, oldest
+def open_per_day(
+    created: np.ndarray, closed: np.ndarray, file: TextIO | None = None
+) -> None:
+    """
+    Find the total number of open pull requests per day
+    """
+    created_days = created.astype("datetime64[D]")
+    closed_days = closed[~np.isnat(closed)].astype("datetime64[D]")
+    start = created_days.min()
+    end = np.datetime64(dt.date.today(), "D")
+    days = (end - start).astype(int) + 1
 
+    # A PR counts as open from the day it was created up to and including
+    # the day it was closed, so it adds one on creation and drops one the
+    # day after closing. Summing those changes day by day gives the total.
+    def count_per_day(dates: np.ndarray) -> np.ndarray:
+        offsets = (dates - start).astype(int)
+        return np.bincount(offsets[offsets < days], minlength=days)
 
-def open_per_day(pull_requests: list[dict], oldest: str) -> None:
+    changes = count_per_day(created_days) - count_per_day(closed_days + 1)
+    for day, open_today in zip(np.arange(start, end + 1), np.cumsum(changes)):
+        print(f"{day}, {open_today}", file=file)
+
+
+def iso_year_week(timestamps: np.ndarray) -> np.ndarray:
     """
-    Find the total number of open pull requests per day
+    ISO year and week number of each timestamp, as year * 100 + week
     """
-    today = dt.date.fromisoformat(oldest[:10])
-    end_date = dt.date.today()
-    delta = dt.timedelta(days=1)
-    while today <= end_date:
-        today_str = str(today)  # yyyy-mm-dd
-        open_today = 0
-        new_pull_requests = []
-
-        for pr in pull_requests:
-            # Slice 2022-03-22T08:39:59Z into 2022-03-22
-            created_date = pr["created_at"][:10]
-            if pr["closed_at"]:
-                closed_date = pr["closed_at"][:10]
-            else:
-                # Somewhere in the future, close enough!
-                # Lets us do <= on strings instead of also checking for None
-                closed_date = "9999-99-99"
-
-            if created_date <= today_str <= closed_date:
-                open_today += 1
-
-            # Ditch closed PRs, don't need them tomorrow
-            if today_str <= closed_date:
-                new_pull_requests.append(pr)
-
-        print(f"{today_str}, {open_today}")
-        pull_requests = list(new_pull_requests)
-        today += delta
-
-
-def opened_per_week(pull_requests: list[dict]) -> None:
+    # Days since 1970-01-01, which was a Thursday
+    days = timestamps.astype("datetime64[D]").astype(np.int64)
+    monday_is_zero = (days + 3) % 7
+    # Each ISO week belongs to the year its Thursday is in
+    thursday = (days - monday_is_zero + 3).astype("datetime64[D]")
+    year = thursday.astype("datetime64[Y]")
+    week = (thursday - year.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+    return (year.astype(np.int64) + 1970) * 100 + week
+
+
+def print_per_week(
+    file: TextIO | None, header: str, weeks: np.ndarray, *counts: np.ndarray
+) -> None:
+    print(header, file=file)
+    for week, *week_counts in zip(weeks, *counts):
+        # 2017 w06, 57, 0
+        print(f"{week // 100} w{week % 100:02}", *week_counts, sep=", ", file=file)
+
+
+def opened_per_week(
+    created: np.ndarray, closed: np.ndarray, file: TextIO | None = None
+) -> None:
     """
     Find the number of pull requests opened in each week
     """
-    open_by_week = defaultdict(lambda: defaultdict(int))
-    for pr in pull_requests:
-        # Slice 2022-03-22T08:39:59Z into 2022-03-22 and make dt.date
-        created_date = dt.date.fromisoformat(pr["created_at"][:10])
-        week_str = (
-            f"{created_date.isocalendar().year} "
-            f"w{created_date.isocalendar().week:02}"
-        )
+    weeks, week_index = np.unique(iso_year_week(created), return_inverse=True)
 
-        # Count all
-        open_by_week[week_str]["any state"] += 1
+    # Count all
+    opened = np.bincount(week_index, minlength=len(weeks))
 
-        # Count only those still open today, they have no closed_at date
-        if not pr["closed_at"]:
-            open_by_week[week_str]["still open"] += 1
-            # open_by_week[week_str] += 1
+    # Count only those still open today, they have no closed_at date
+    still_open = np.bincount(week_index[np.isnat(closed)], minlength=len(weeks))
 
-    print("Week number, PRs opened this week, PRs opened this week and still open")
-    for k, v in sorted(open_by_week.items()):
-        print(f"{k}, {v['any state']}, {v['still open']}")
+    print_per_week(
+        file,
+        "Week number, PRs opened this week, PRs opened this week and still open",
+        weeks,
+        opened,
+        still_open,
+    )
 
 
-def closed_per_week(pull_requests: list[dict]) -> None:
+def closed_per_week(
+    closed: np.ndarray, merged: np.ndarray, file: TextIO | None = None
+) -> None:
     """
     Find the number of pull requests closed in each week
     """
-    closed_by_week = defaultdict(lambda: defaultdict(int))
-    for pr in pull_requests:
-        if not pr["closed_at"]:
-            continue
-        # Slice 2022-03-22T08:39:59Z into 2022-03-22 and make dt.date
-        closed_date = dt.date.fromisoformat(pr["closed_at"][:10])
-        week_str = (
-            f"{closed_date.isocalendar().year} w{closed_date.isocalendar().week:02}"
-        )
-
-        # Count all
-        closed_by_week[week_str]["closed"] += 1
-
-        # Count only those that got merged
-        if pr["merged_at"]:
-            closed_by_week[week_str]["merged"] += 1
-            # open_by_week[week_str] += 1
-
-    print("Week number, PRs closed this week, PRs merged this week")
-    for k, v in sorted(closed_by_week.items()):
-        # print(f"{k}, {v}")
-        print(f"{k}, {v['closed']}, {v['merged']}")
+    is_closed = ~np.isnat(closed)
+    weeks, week_index = np.unique(iso_year_week(closed[is_closed]), return_inverse=True)
+
+    # Count all
+    closed_count = np.bincount(week_index, minlength=len(weeks))
+
+    # Count only those that got merged
+    is_merged = ~np.isnat(merged[is_closed])
+    merged_count = np.bincount(week_index[is_merged], minlength=len(weeks))
+
+    print_per_week(
+        file,
+        "Week number, PRs closed this week, PRs merged this week",
+        weeks,
+        closed_count,
+        merged_count,
+    )
 
 
 def main():
@@ -133,19 +123,42 @@ def main():
     parser.add_argument(
         "--closed_per_week", action="store_true", help=closed_per_week.__doc__
     )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Write all the reports to CSV files in the output directory",
+    )
+    parser.add_argument(
+        "--output-dir", default=".", help="Where to write CSV files for --all"
+    )
     args = parser.parse_args()
 
-    with jsonlines.open("pr_list.jsonl") as reader:
-        pull_requests = list(reader)
-    # print(f"{len(pull_requests)=}")
+    timestamps = load_timestamps(find_jsonl("pr_list.jsonl"))
+    created = timestamps["created_at"]
+    closed = timestamps["closed_at"]
+    merged = timestamps["merged_at"]
+    # print(f"{len(created)=}")
 
-    pull_requests, oldest = find_oldest(pull_requests)
     if args.open_per_day:
-        open_per_day(pull_requests, oldest)
+        open_per_day(created, closed)
     if args.opened_per_week:
-        opened_per_week(pull_requests)
+        opened_per_week(created, closed)
     if args.closed_per_week:
-        closed_per_week(pull_requests)
+        closed_per_week(closed, merged)
+
+    if args.all:
+        # Load the data once and share it between the reports
+        reports = {
+            "prs_open_per_day.csv": lambda f: open_per_day(created, closed, f),
+            "prs_opened_per_week.csv": lambda f: opened_per_week(created, closed, f),
+            "prs_closed_per_week.csv": lambda f: closed_per_week(closed, merged, f),
+        }
+        os.makedirs(args.output_dir, exist_ok=True)
+        for filename, report in reports.items():
+            path = os.path.join(args.output_dir, filename)
+            with open(path, "w", encoding="utf-8") as f:
+                report(f)
+            print(f"Wrote {path}")
 
 
 if __name__ == "__main__":
@@ -17,18 +17,22 @@ To remove, re-login with basic permissions:
 
 # /// script
 # requires-python = ">=3.10"
-# dependencies = ["termcolor"]
+# dependencies = ["httpx", "termcolor"]
 # ///
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 import subprocess
 import sys
 from typing import Any
 
+import httpx
 from termcolor import cprint
 
+API_URL = "https://api.github.com"
+
 VARIABLES = {
     "DO_NOT_TRACK": "true",
     "GH_TELEMETRY": "false",
@@ -39,17 +43,59 @@ def gh(*args: str) -> subprocess.CompletedProcess[str]:
     return subprocess.run(["gh", *args], capture_output=True, text=True, check=True)
 
 
+@functools.cache
+def api() -> httpx.Client:
+    """One pooled connection to the API, using the token gh is logged in with"""
+    try:
+        token = gh("auth", "token").stdout.strip()
+    except subprocess.CalledProcessError as e:
+        cprint(
+            f"Failed to get a token with `gh auth token`: {e.stderr.strip()}",
+            "red",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    return httpx.Client(
+        base_url=API_URL,
+        headers={
+            "Accept": "application/vnd.github+json",
+            "Authorization": f"Bearer {token}",
+        },
+        timeout=10,
+    )
+
+
+def set_variable(path: str, name: str, value: str, **extra: str) -> None:
+    """Create the variable, or update it if it already exists, like gh does"""
+    body = {"name": name, "value": value, **extra}
+    r = api().post(f"{path}/actions/variables", json=body)
+    if r.status_code == 409:
+        r = api().patch(f"{path}/actions/variables/{name}", json=body)
+    r.raise_for_status()
+
+
+def error_message(e: httpx.HTTPError) -> str:
+    if not isinstance(e, httpx.HTTPStatusError):
+        # Timeouts, connection errors and the like
+        return f"{type(e).__name__}: {e}"
+    try:
+        message = e.response.json()["message"]
+    except (ValueError, KeyError):
+        message = e.response.text
+    return f"HTTP {e.response.status_code}: {message}"
+
+
 def set_org_variables(org: str, *, dry_run: bool) -> None:
     for name, value in VARIABLES.items():
         if dry_run:
-            cprint(f"  [dry-run] gh variable set {name} --org {org}", "yellow")
+            cprint(f"  [dry-run] set {name}={value} for org {org}", "yellow")
         else:
             try:
-                gh("variable", "set", name, "--body", value, "--org", org)
+                set_variable(f"/orgs/{org}", name, value, visibility="private")
                 cprint(f"  Set {name}={value}", "green")
-            except subprocess.CalledProcessError as e:
+            except httpx.HTTPError as e:
                 cprint(
-                    f"  Failed to set {name}: {e.stderr.strip()}",
+                    f"  Failed to set {name}: {error_message(e)}",
                     "red",
                     file=sys.stderr,
                 )
@@ -74,17 +120,20 @@ def set_repo_variables(repo: str, *, dry_run: bool) -> bool:
     """Set variables on a repo. Returns False if the repo has no Actions API."""
     for name, value in VARIABLES.items():
         if dry_run:
-            cprint(f"  [dry-run] gh variable set {name} --repo {repo}", "yellow")
+            cprint(f"  [dry-run] set {name}={value} for repo {repo}", "yellow")
         else:
             try:
-                gh("variable", "set", name, "--body", value, "--repo", repo)
+                set_variable(f"/repos/{repo}", name, value)
                 cprint(f"  Set {name}={value}", "green")
-            except subprocess.CalledProcessError as e:
-                if "HTTP 404" in e.stderr:
+            except httpx.HTTPError as e:
+                if (
+                    isinstance(e, httpx.HTTPStatusError)
+                    and e.response.status_code == 404
+                ):
                     cprint("  Skipped (Actions not available)", "yellow")
                     return False
                 cprint(
-                    f"  Failed to set {name}: {e.stderr.strip()}",
+                    f"  Failed to set {name}: {error_message(e)}",
                     "red",
                     file=sys.stderr,
                 )
@@ -156,6 +205,10 @@ def main() -> None:
             set_repo_variables(name, dry_run=args.dry_run)
             done_repos.add(name)
 
+    # Close the connection, if one was opened
+    if api.cache_info().currsize:
+        api().close()
+
 
 if __name__ == "__main__":
     main()
@@ -11,26 +11,151 @@ from __future__ import annotations
 import argparse
 import json
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
 
-from github import Github  # pip install PyGithub
+from github_client import GitHubClient
+from snapshot import DEFAULT_FIELDS, iter_jsonl, open_jsonl, project
 
-GITHUB_TOKEN = os.environ["GITHUB_TOOLS_TOKEN"]
+REPO_URL = "https://api.github.com/repos/python/cpython"
 OUTPUT_FILE_ISSUES = "issue_list.jsonl"
 OUTPUT_FILE_PRS = "pr_list.jsonl"
+PER_PAGE = 100
 
 
-def download(label: str, output_file: str, repo_get_fn) -> None:
+def checkpoint_path(output_file: str) -> str:
+    return output_file + ".checkpoint"
+
+
+def to_json(data: dict, fields: list[str] | None) -> str:
+    if fields:
+        data = project(data, fields)
+    return json.dumps(data)
+
+
+def page_url(url: str, page: int) -> str:
+    return f"{url}&page={page + 1}"
+
+
+def download(
+    label: str,
+    output_file: str,
+    client: GitHubClient,
+    url: str,
+    workers: int,
+    fields: list[str] | None = None,
+) -> None:
     # Output file is 514 MB for 31,984 PRs!
     # Output file is 525 MB for 32,611 PRs! (16 mins)
     # Output file is 387 MB for 91,726 issues! (16 mins)
-    with open(output_file, "w", encoding="utf-8") as f:
-        for i, item in enumerate(repo_get_fn(state="all")):
-            if i % 10 == 0:
-                print(f"Retrieved {i} {label}", end="\r")
-            f.write(json.dumps(item._rawData))
-            f.write("\n")
+    url = f"{url}?state=all&per_page={PER_PAGE}"
+    r = client.get(page_url(url, 0))
+    first_page = r.json()
+    pages = 1
+    if "last" in r.links:
+        pages = int(parse_qs(urlparse(r.links["last"]["url"]).query)["page"][0])
+    print(f"Retrieving {label} in {pages} pages")
+
+    # Record each page as it's saved, so an interrupted download can resume
+    checkpoint_file = checkpoint_path(output_file)
+    start = 0
+    # Newest first, so items created since the last run push the rest onto
+    # later pages. When resuming, skip any that were already written.
+    written: set[int] = set()
+    if os.path.exists(checkpoint_file) and os.path.exists(output_file):
+        with open(checkpoint_file, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        start = checkpoint["pages"]
+        # Drop anything written after the last checkpoint
+        os.truncate(output_file, checkpoint["size"])
+        # Numbers don't follow creation order, issues moved from bpo or other
+        # repos have high numbers but old dates, so check what's in the file
+        written = {item["number"] for item in iter_jsonl(output_file, ["number"])}
+        print(f"Resuming from page {start + 1}")
+    else:
+        open(output_file, "wb").close()
+
+    def get_page(page: int) -> list:
+        if page == 0:
+            return first_page
+        return client.get(page_url(url, page)).json()
+
+    def write_page(page: int, page_items: list) -> None:
+        # Append and close each page, so the file is complete at every
+        # checkpoint (for gzip, each page is a separate gzip member)
+        with open_jsonl(output_file, "a") as f:
+            for item in page_items:
+                if item["number"] in written:
+                    continue
+                f.write(to_json(item, fields))
+                f.write("\n")
+
+        checkpoint = {"pages": page + 1, "size": os.path.getsize(output_file)}
+        with open(checkpoint_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(checkpoint_file + ".tmp", checkpoint_file)
+        print(f"Retrieved {page + 1} of {pages} pages of {label}", end="\r")
+
+    # Fetch pages in parallel but write them in order, only keeping a few
+    # finished pages in memory while waiting for an earlier, slower one
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = deque()
+        for page in range(start, pages):
+            futures.append((page, executor.submit(get_page, page)))
+            if len(futures) >= 2 * workers:
+                done_page, future = futures.popleft()
+                write_page(done_page, future.result())
+        while futures:
+            done_page, future = futures.popleft()
+            write_page(done_page, future.result())
     print()
 
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+
+def download_incremental(
+    label: str,
+    output_file: str,
+    client: GitHubClient,
+    url: str,
+    fields: list[str] | None = None,
+) -> None:
+    """Fetch only items updated since the last download and merge them in"""
+    items = {item["number"]: item for item in iter_jsonl(output_file)}
+
+    # ISO 8601 timestamps sort as strings
+    since = max(item["updated_at"] for item in items.values())
+    print(f"Retrieving {label} updated since {since}")
+
+    updated = 0
+    url = f"{url}?state=all&sort=updated&direction=desc&per_page={PER_PAGE}"
+    for page in client.paginate(url):
+        # Most recently updated first, so stop at the first one we already have
+        new_items = [item for item in page if item["updated_at"] >= since]
+        for item in new_items:
+            items[item["number"]] = project(item, fields) if fields else item
+        updated += len(new_items)
+        print(f"Retrieved {updated} {label}", end="\r")
+        if len(new_items) < len(page):
+            break
+    print(f"Retrieved {updated} {label}")
+
+    # Write newest first, same as a full download
+    # Keep the suffix so it's compressed the same way
+    root, ext = os.path.splitext(output_file)
+    tmp_file = f"{root}.tmp{ext}"
+    with open_jsonl(tmp_file, "w") as f:
+        for number in sorted(items, reverse=True):
+            f.write(json.dumps(items[number]))
+            f.write("\n")
+    os.replace(tmp_file, output_file)
+
+    # Any full download left unfinished would now resume into the wrong file
+    if os.path.exists(checkpoint_path(output_file)):
+        os.remove(checkpoint_path(output_file))
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
@@ -46,22 +171,75 @@ def main() -> None:
         action="store_true",
         help="Download PRs only. If neither flag used, download PRs and issues.",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch items updated since the newest one in the existing files, "
+        "and merge them in. Does a full download if there's no existing file, "
+        "or finishes one that was interrupted.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of pages to download at the same time",
+    )
+    parser.add_argument(
+        "-z",
+        "--compress",
+        action="store_true",
+        help="Save gzipped files, with a .gz suffix",
+    )
+    parser.add_argument(
+        "-f",
+        "--fields",
+        nargs="*",
+        metavar="FIELD",
+        help="Only save these fields, with dots for nested fields like user.login. "
+        f"Use on its own for the default fields: {' '.join(DEFAULT_FIELDS)}",
+    )
     args = parser.parse_args()
 
     # If neither flag, download both sets
     if not args.issues and not args.prs:
         args.issues = args.prs = True
 
-    g = Github(GITHUB_TOKEN, per_page=100)
-    repo = g.get_repo("python/cpython")
+    fields = args.fields
+    if fields == []:
+        fields = list(DEFAULT_FIELDS)
+    if fields:
+        # Always needed for --incremental
+        fields = list(dict.fromkeys(["number", "updated_at", *fields]))
+
+    output_file_prs, output_file_issues = OUTPUT_FILE_PRS, OUTPUT_FILE_ISSUES
+    if args.compress:
+        output_file_prs += ".gz"
+        output_file_issues += ".gz"
 
-    if args.prs:
-        print("Downloading PRs")
-        download("PRs", OUTPUT_FILE_PRS, repo.get_pulls)
+    def incremental(output_file: str) -> bool:
+        if not args.incremental or not os.path.exists(output_file):
+            return False
+        if os.path.exists(checkpoint_path(output_file)):
+            # Only part of the items, so finish the full download first
+            print(f"Resuming unfinished download of {output_file}")
+            return False
+        return True
 
-    if args.issues:
-        print("Downloading issues")
-        download("issues", OUTPUT_FILE_ISSUES, repo.get_issues)
+    # One pooled session shared by the workers, PyGithub isn't thread-safe
+    token = os.environ["GITHUB_TOOLS_TOKEN"]
+    with GitHubClient(token, pool_size=args.workers) as client:
+        for wanted, label, output_file, url in (
+            (args.prs, "PRs", output_file_prs, f"{REPO_URL}/pulls"),
+            (args.issues, "issues", output_file_issues, f"{REPO_URL}/issues"),
+        ):
+            if not wanted:
+                continue
+            print(f"Downloading {label}")
+            if incremental(output_file):
+                download_incremental(label, output_file, client, url, fields)
+            else:
+                download(label, output_file, client, url, args.workers, fields)
 
 
 if __name__ == "__main__":
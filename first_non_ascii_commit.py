@@ -4,41 +4,256 @@ Find first and total commits with non-ASCII messages and authors
 
 from __future__ import annotations
 
+import argparse
+import json
+import math
+import os
+import subprocess
 import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import NamedTuple
 
-from git import Repo  # pip install GitPython
+# NUL between fields, and git log -z adds another between commits
+GIT_LOG_FORMAT = "%H%x00%an%x00%ct%x00%B"
+FIELDS_PER_COMMIT = 4
 
 
-def print_info(commit: str) -> None:
+class Commit(NamedTuple):
+    sha: str
+    author: bytes
+    committed_date: int
+    message: bytes
+
+    def to_json(self) -> list:
+        return [
+            self.sha,
+            to_str(self.author),
+            self.committed_date,
+            to_str(self.message),
+        ]
+
+    @classmethod
+    def from_json(cls, data: list) -> Commit:
+        sha, author, committed_date, message = data
+        return cls(sha, to_bytes(author), committed_date, to_bytes(message))
+
+
+# Round-trip any invalid UTF-8 through the JSON state file
+def to_str(value: bytes) -> str:
+    return value.decode("utf-8", "surrogateescape")
+
+
+def to_bytes(value: str) -> bytes:
+    return value.encode("utf-8", "surrogateescape")
+
+
+@dataclass
+class Scan:
+    """Totals for a contiguous range of commits"""
+
+    commits: int = 0
+    # Position in the range and the commit
+    first_message: tuple[int, Commit] | None = None
+    first_author: tuple[int, Commit] | None = None
+    non_ascii_commit_messages: int = 0
+    non_ascii_authors: int = 0
+    authors: set[bytes] = field(default_factory=set)
+
+    def add(self, commit: Commit) -> None:
+        if not commit.message.isascii():
+            if not self.first_message:
+                self.first_message = (self.commits, commit)
+            self.non_ascii_commit_messages += 1
+
+        if not commit.author.isascii():
+            if not self.first_author:
+                self.first_author = (self.commits, commit)
+            self.authors.add(commit.author)
+            self.non_ascii_authors += 1
+
+        self.commits += 1
+
+    def extend(self, later: Scan) -> None:
+        """Add the totals from the range right after this one"""
+        if not self.first_message and later.first_message:
+            position, commit = later.first_message
+            self.first_message = (self.commits + position, commit)
+        if not self.first_author and later.first_author:
+            position, commit = later.first_author
+            self.first_author = (self.commits + position, commit)
+        self.non_ascii_commit_messages += later.non_ascii_commit_messages
+        self.non_ascii_authors += later.non_ascii_authors
+        self.authors |= later.authors
+        self.commits += later.commits
+
+    def to_json(self) -> dict:
+        return {
+            "commits": self.commits,
+            "first_message": self.first_message
+            and [self.first_message[0], self.first_message[1].to_json()],
+            "first_author": self.first_author
+            and [self.first_author[0], self.first_author[1].to_json()],
+            "non_ascii_commit_messages": self.non_ascii_commit_messages,
+            "non_ascii_authors": self.non_ascii_authors,
+            "authors": sorted(map(to_str, self.authors)),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> Scan:
+        firsts = {}
+        for name in ("first_message", "first_author"):
+            if data[name]:
+                position, commit = data[name]
+                firsts[name] = (position, Commit.from_json(commit))
+        return cls(
+            commits=data["commits"],
+            non_ascii_commit_messages=data["non_ascii_commit_messages"],
+            non_ascii_authors=data["non_ascii_authors"],
+            authors=set(map(to_bytes, data["authors"])),
+            **firsts,
+        )
+
+
+def iter_commits(repo_path: str, shas: list[str]) -> Iterator[Commit]:
+    """Stream these commits, in this order, from a single git log"""
+    cmd = ["git", "-C", repo_path, "log", "-z", "--no-walk=unsorted", "--stdin"]
+    cmd.append(f"--format={GIT_LOG_FORMAT}")
+    with subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE) as proc:
+        # git reads all of stdin before it starts writing
+        proc.stdin.write("\n".join(shas).encode())
+        proc.stdin.close()
+
+        values = []
+        rest = b""
+        while chunk := proc.stdout.read(1024 * 1024):
+            *complete, rest = (rest + chunk).split(b"\0")
+            for value in complete:
+                values.append(value)
+                if len(values) == FIELDS_PER_COMMIT:
+                    sha, author, committed_date, message = values
+                    yield Commit(sha.decode(), author, int(committed_date), message)
+                    values = []
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def scan(repo_path: str, shas: list[str]) -> Scan:
+    result = Scan()
+    for commit in iter_commits(repo_path, shas):
+        result.add(commit)
+    return result
+
+
+def scan_parallel(repo_path: str, rev: str, jobs: int) -> Scan:
+    """Split the history into contiguous ranges and scan them in parallel"""
+    shas = subprocess.check_output(
+        ["git", "-C", repo_path, "rev-list", "--reverse", rev], text=True
+    ).split()
+    size = max(1, math.ceil(len(shas) / jobs))
+    ranges = [shas[i : i + size] for i in range(0, len(shas), size)]
+
+    total = Scan()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Results come back in order, oldest range first
+        for result in executor.map(scan, repeat(repo_path), ranges):
+            total.extend(result)
+    return total
+
+
+def is_ancestor(repo_path: str, ancestor: str, rev: str) -> bool:
+    # Exit code is 0 if it is an ancestor, 1 if not, and 128 if not found
+    cmd = ["git", "-C", repo_path, "merge-base", "--is-ancestor", ancestor, rev]
+    return subprocess.run(cmd, capture_output=True).returncode == 0
+
+
+def scan_incremental(repo_path: str, rev: str, jobs: int, state_file: str) -> Scan:
+    """
+    Only scan commits added since the last run, if it's still in the history.
+    The totals so far and the last commit scanned are kept in the state file.
+    """
+    tip = subprocess.check_output(
+        ["git", "-C", repo_path, "rev-parse", "--verify", rev], text=True
+    ).strip()
+
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = None
+
+    if state and is_ancestor(repo_path, state["last_sha"], tip):
+        total = Scan.from_json(state["scan"])
+        total.extend(scan_parallel(repo_path, f"{state['last_sha']}..{tip}", jobs))
+    else:
+        total = scan_parallel(repo_path, tip, jobs)
+
+    state = {"last_sha": tip, "scan": total.to_json()}
+    with open(state_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(state_file + ".tmp", state_file)
+    return total
+
+
+def print_info(commit: Commit) -> None:
     # print(commit)
-    print(commit.author)
-    print(commit.message)
+    print(commit.author.decode(errors="replace"))
+    print(commit.message.decode(errors="replace"))
     print(time.asctime(time.gmtime(commit.committed_date)))
-    print(f"https://github.com/python/cpython/commit/{commit}")
+    print(f"https://github.com/python/cpython/commit/{commit.sha}")
     print()
 
 
 def main() -> None:
-    repo = Repo("~/github/cpython")
-    non_ascii_commit_messages = non_ascii_authors = 0
-    authors = set()
-    for commit in repo.iter_commits("main", reverse=True):
-        if not commit.message.isascii():
-            if not non_ascii_commit_messages:
-                print("First non-ASCII commit message:\n")
-                print_info(commit)
-            non_ascii_commit_messages += 1
-
-        if not commit.author.name.isascii():
-            if not non_ascii_authors:
-                print("First non-ASCII commit author:\n")
-                print_info(commit)
-            authors.add(commit.author.name)
-            non_ascii_authors += 1
-
-    print("Total non-ASCII commit messages:", non_ascii_commit_messages)
-    print("Total non-ASCII commit authors:", non_ascii_authors)
-    print("Unique non-ASCII commit authors:", len(authors))
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "repo", nargs="?", default="~/github/cpython", help="Git repo to check"
+    )
+    parser.add_argument("--rev", default="main", help="Branch or commit to scan")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes to scan with",
+    )
+    parser.add_argument(
+        "--state",
+        # Use same name as this .py but with .json, outside the checkout
+        default=os.path.join(
+            os.path.expanduser("~/.cache/github-tools"),
+            os.path.splitext(os.path.basename(__file__))[0] + ".json",
+        ),
+        help="File to keep totals in, so the next run only scans new commits",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Rescan everything, not just new commits"
+    )
+    args = parser.parse_args()
+
+    repo_path = os.path.expanduser(args.repo)
+    os.makedirs(os.path.dirname(os.path.abspath(args.state)), exist_ok=True)
+    if args.full and os.path.exists(args.state):
+        os.remove(args.state)
+    total = scan_incremental(repo_path, args.rev, args.jobs, args.state)
+
+    # Print the first hits in the order they happened
+    firsts = [
+        (total.first_message, "First non-ASCII commit message:\n"),
+        (total.first_author, "First non-ASCII commit author:\n"),
+    ]
+    firsts = [(first, title) for first, title in firsts if first]
+    for (_, commit), title in sorted(firsts, key=lambda first: first[0][0]):
+        print(title)
+        print_info(commit)
+
+    print("Total non-ASCII commit messages:", total.non_ascii_commit_messages)
+    print("Total non-ASCII commit authors:", total.non_ascii_authors)
+    print("Unique non-ASCII commit authors:", len(total.authors))
 
 
 if __name__ == "__main__":
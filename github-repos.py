@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 """
 Show which non-fork repos I created this year.
+Or for several users and years, with a table of how many.
 """
 
 from __future__ import annotations
 
 import argparse
 import datetime
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-import requests
+from github_client import GitHubClient
 
 # from pprint import pprint
 
@@ -25,49 +30,29 @@ def timestamp():
     print(datetime.datetime.now().strftime("%A, %d. %B %Y %I:%M%p") + " " + __file__)
 
 
-def bleep(url):
-    """Call the API and return JSON and next URL"""
-    print(url)
-    r = requests.get(url, timeout=10)
-
-    try:
-        next = r.links["next"]["url"]
-    except KeyError:
-        next = None
-
-    print("r.status_code", r.status_code)
-    print("X-Ratelimit-Limit", r.headers["X-Ratelimit-Limit"])
-    print("X-Ratelimit-Remaining", r.headers["X-Ratelimit-Remaining"])
-
-    if (r.status_code) == 200:
-        return r.json(), next
-
-    return None, None
-
-
-def bloop(user, url):
+def bloop(client, user, url, workers=4):
     """Get all JSON from each page of API results"""
     results = []
 
-    # Fetch all from GitHub
-    next_page = REPOS_URL.format(user)
-    while True:
-        new_results, next_page = bleep(next_page)
+    # Fetch all from GitHub, the pages after the first at the same time
+    for new_results in client.paginate_parallel(url.format(user), workers):
         results.extend(new_results)
         print(len(results))
 
-        if not next_page:
-            break
-
     return results
 
 
-def get_repos(user, year):
-    """Get all non-fork repos created in this year"""
-    repos = bloop(user, REPOS_URL)
+def get_repos(client, user, workers=4):
+    """Get all non-fork repos"""
+    repos = bloop(client, user, REPOS_URL, workers)
     #     pprint(repos)
     print(len(repos))
 
+    return [repo for repo in repos if not repo["fork"]]
+
+
+def created_in(repos, year):
+    """Get the repos created in this year"""
     kept = []
     # forks_count = 0
     # stargazers_count = 0
@@ -75,22 +60,20 @@ def get_repos(user, year):
     # open_issues_count = 0
     # subscribers_count = 0
     for repo in repos:
-        if not repo["fork"] and repo["created_at"].startswith(str(year)):
+        if repo["created_at"].startswith(str(year)):
             kept.append(repo)
             # forks_count += repo["forks_count"]
             # stargazers_count += repo["stargazers_count"]
             # watchers_count += repo["watchers_count"]
             # open_issues_count += repo["open_issues_count"]
             # subscribers_count += repo["subscribers_count"]
-            print(repo["html_url"])
-
-    print(len(kept), "non-fork repos created in", year)
 
     # print("forks_count", forks_count)
     # print("stargazers_count", stargazers_count)
     # print("watchers_count", watchers_count)
     # print("open_issues_count", open_issues_count)
     # print("subscribers_count", subscribers_count)
+    return kept
 
 
 if __name__ == "__main__":
@@ -100,10 +83,62 @@ if __name__ == "__main__":
         description="Show which non-fork repos I created this year.",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
-    parser.add_argument("--user", default="hugovk", help="User to check")
-    parser.add_argument("--year", default="2015", help="Year to check")
+    parser.add_argument("--user", nargs="+", default=["hugovk"], help="Users to check")
+    parser.add_argument(
+        "--year", nargs="+", type=int, default=[2015], help="Years to check"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of users, and pages for each, to fetch at the same time",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Don't show each request, only rate limit waits",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.expanduser("~/.cache/github-tools"),
+        help="Keep repo listings here and only download them again if changed",
+    )
     args = parser.parse_args()
 
-    get_repos(args.user, args.year)
+    # Show each request and the rate limit
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s"
+    )
+
+    with (
+        GitHubClient(
+            os.environ.get("GITHUB_TOOLS_TOKEN"),
+            # Pages for each user at the same time
+            pool_size=args.workers * args.workers,
+            cache_dir=args.cache_dir,
+        ) as client,
+        ThreadPoolExecutor(max_workers=args.workers) as executor,
+    ):
+        # Each user's listing once, for all the years
+        all_repos = executor.map(
+            partial(get_repos, client, workers=args.workers), args.user
+        )
+        table = []
+        for user, repos in zip(args.user, all_repos):
+            row = [user]
+            for year in args.year:
+                kept = created_in(repos, year)
+                for repo in kept:
+                    print(repo["html_url"])
+                print(len(kept), "non-fork repos created in", year, "by", user)
+                row.append(len(kept))
+            table.append(row)
+
+    print()
+    print("\t".join(["user"] + [str(year) for year in args.year]))
+    for row in table:
+        print("\t".join(map(str, row)))
 
 # End of file
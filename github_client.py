@@ -0,0 +1,341 @@
+"""
+GitHub REST/GraphQL client shared by the requests-based scripts.
+
+Keeps connections open, waits when the rate limit runs out,
+retries when rate limited, follows Link header pagination,
+splits searches by date to get past the 1000 result limit,
+and can cache responses on disk to make conditional requests.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+import requests  # pip install requests
+
+logger = logging.getLogger(__name__)
+
+API_HOST = "api.github.com"
+SEARCH_ISSUES_URL = f"https://{API_HOST}/search/issues"
+
+# GitHub doesn't say how long to wait for secondary rate limits without a
+# Retry-After header, but recommends at least a minute
+SECONDARY_RATE_LIMIT_WAIT = 60
+MAX_RETRIES = 5
+# The search API only gives the first 1000 results of any query
+SEARCH_LIMIT = 1000
+SEARCH_PER_PAGE = 100
+
+
+class RateLimit:
+    """
+    Token bucket for one API resource (core, search, graphql),
+    filled from the X-RateLimit-* headers of each response
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.remaining: int | None = None
+        self.reset = 0.0
+
+    def wait(self) -> None:
+        """Take a token, or sleep until the reset if there are none left"""
+        with self.lock:
+            if self.remaining is None or time.time() >= self.reset:
+                # Not known yet, or already refilled
+                return
+            if self.remaining > 0:
+                self.remaining -= 1
+                return
+            reset = self.reset
+        # Sleep without the lock, so other threads can still update it
+        sleep_until(reset)
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        if "X-RateLimit-Remaining" in headers:
+            with self.lock:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+                self.reset = int(headers["X-RateLimit-Reset"])
+
+
+class ETagCache:
+    """
+    Responses kept on disk with their ETag, so the next request for the same
+    URL can send If-None-Match and GitHub can reply 304 Not Modified, which
+    doesn't count against the rate limit
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url: str, token: str | None) -> str:
+        # Different tokens can see different things
+        key = hashlib.sha256(f"{token}\n{url}".encode()).hexdigest()
+        return os.path.join(self.directory, key + ".json")
+
+    def load(self, url: str, token: str | None) -> dict | None:
+        try:
+            with open(self.path(url, token), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, url: str, token: str | None, r: requests.Response) -> None:
+        entry = {
+            "url": url,
+            "etag": r.headers["ETag"],
+            "link": r.headers.get("Link"),
+            "body": r.text,
+        }
+        path = self.path(url, token)
+        # Write to a temporary file first so other threads never see half of it
+        with open(f"{path}.{threading.get_ident()}.tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(f"{path}.{threading.get_ident()}.tmp", path)
+
+    @staticmethod
+    def fill(r: requests.Response, entry: dict) -> None:
+        """Turn a 304 into the cached 200"""
+        r.status_code = 200
+        r._content = entry["body"].encode()
+        r.encoding = "utf-8"
+        r.headers["ETag"] = entry["etag"]
+        if entry["link"]:
+            r.headers["Link"] = entry["link"]
+
+
+def sleep_until(timestamp: float) -> None:
+    seconds = max(0, timestamp - time.time()) + 1
+    reset_time = datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+    logger.warning(
+        "Rate limit exceeded, sleeping %d seconds until %s", seconds, reset_time
+    )
+    time.sleep(seconds)
+
+
+def resource(url: str) -> str | None:
+    """Which rate limit applies to this URL, or None if it's not the API"""
+    parts = urlparse(url)
+    if parts.hostname != API_HOST:
+        return None
+    if parts.path.startswith("/search/"):
+        return "search"
+    if parts.path.startswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+def retry_after(r: requests.Response) -> float | None:
+    """Seconds to wait before retrying a rate-limited response, else None"""
+    if r.status_code not in (403, 429):
+        return None
+    if "Retry-After" in r.headers:
+        return int(r.headers["Retry-After"])
+    if r.headers.get("X-RateLimit-Remaining") == "0":
+        return max(0, int(r.headers["X-RateLimit-Reset"]) - time.time()) + 1
+    if "secondary rate limit" in r.text.lower():
+        return SECONDARY_RATE_LIMIT_WAIT
+    return None
+
+
+class GitHubClient:
+    def __init__(
+        self,
+        token: str | None = None,
+        pool_size: int = 10,
+        cache_dir: str | None = None,
+    ) -> None:
+        self.token = token
+        self.cache = ETagCache(cache_dir) if cache_dir else None
+        self.session = requests.Session()
+        # Keep a connection open for each thread using the client
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self.rate_limits = defaultdict(RateLimit)
+
+    def __enter__(self) -> GitHubClient:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.session.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", 10)
+        name = resource(url)
+        rate_limit = self.rate_limits[name] if name else None
+
+        cacheable = self.cache and method == "GET" and not kwargs.get("stream")
+        cached = self.cache.load(url, self.token) if cacheable else None
+        if cached:
+            kwargs["headers"] = {
+                **kwargs.get("headers", {}),
+                "If-None-Match": cached["etag"],
+            }
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            if rate_limit:
+                rate_limit.wait()
+            r = self.session.request(method, url, **kwargs)
+            logger.info(
+                "%s %s %d (rate limit remaining: %s/%s)",
+                method,
+                url,
+                r.status_code,
+                r.headers.get("X-RateLimit-Remaining"),
+                r.headers.get("X-RateLimit-Limit"),
+            )
+            if rate_limit:
+                rate_limit.update(r.headers)
+
+            wait = retry_after(r)
+            if wait is None or attempt == MAX_RETRIES:
+                break
+            logger.warning("Rate limited, retrying in %d seconds: %s", wait, url)
+            # Give the connection back to the pool, even if streaming
+            r.close()
+            time.sleep(wait)
+
+        r.raise_for_status()
+        if cached and r.status_code == 304:
+            self.cache.fill(r, cached)
+        elif cacheable and "ETag" in r.headers:
+            self.cache.save(url, self.token, r)
+        return r
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_json(self, url: str, **kwargs) -> tuple[Any, str | None]:
+        """Call the API and return JSON and next URL"""
+        r = self.get(url, **kwargs)
+        try:
+            next_url = r.links["next"]["url"]
+        except KeyError:
+            next_url = None
+        return r.json(), next_url
+
+    def paginate(self, url: str) -> Iterator[Any]:
+        """Yield the JSON of each page, following the Link headers"""
+        next_url = url
+        while next_url:
+            data, next_url = self.get_json(next_url)
+            yield data
+
+    def paginate_parallel(self, url: str, workers: int = 4) -> Iterator[Any]:
+        """
+        Like paginate, but use the first page's rel="last" link to fetch
+        all the other pages at the same time. Pages are yielded in order.
+        """
+        r = self.get(url)
+        yield r.json()
+        if "last" not in r.links:
+            # Cursor pagination has no last page, so follow the next links
+            if "next" in r.links:
+                yield from self.paginate(r.links["next"]["url"])
+            return
+
+        last = urlparse(r.links["last"]["url"])
+        params = parse_qs(last.query)
+        urls = []
+        for page in range(2, int(params["page"][0]) + 1):
+            params["page"] = [str(page)]
+            urls.append(urlunparse(last._replace(query=urlencode(params, doseq=True))))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for r in executor.map(self.get, urls):
+                yield r.json()
+
+    def search_page(
+        self,
+        query: str,
+        start: datetime.date,
+        end: datetime.date,
+        page: int = 1,
+        url: str = SEARCH_ISSUES_URL,
+    ) -> Any:
+        """One page of issues and PRs matching the query, created from start to end"""
+        params = {
+            "q": f"{query} created:{start.isoformat()}..{end.isoformat()}",
+            "per_page": SEARCH_PER_PAGE,
+            "page": page,
+        }
+        return self.get(f"{url}?{urlencode(params)}").json()
+
+    def search_issues(
+        self,
+        query: str,
+        start: datetime.date,
+        end: datetime.date,
+        workers: int = 4,
+        url: str = SEARCH_ISSUES_URL,
+    ) -> list[Any]:
+        """
+        Search issues and PRs created from start to end, inclusive.
+        Date ranges with more results than the search API will give are split
+        in half until they fit. The ranges and their pages are fetched
+        concurrently and merged in date order, without duplicates.
+        """
+
+        def search(date_range: tuple[datetime.date, datetime.date], page: int = 1):
+            return self.search_page(query, *date_range, page=page, url=url)
+
+        shards = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            ranges = [(start, end)]
+            while ranges:
+                split = []
+                for (lo, hi), data in zip(ranges, executor.map(search, ranges)):
+                    if data["total_count"] <= SEARCH_LIMIT or lo == hi:
+                        if data["total_count"] > SEARCH_LIMIT:
+                            logger.warning(
+                                "Only the first %d of %d results created on %s",
+                                SEARCH_LIMIT,
+                                data["total_count"],
+                                lo,
+                            )
+                        shards.append(((lo, hi), data))
+                        continue
+                    middle = lo + (hi - lo) // 2
+                    split.append((lo, middle))
+                    split.append((middle + datetime.timedelta(days=1), hi))
+                ranges = split
+
+            # Fetch the rest of the pages of every range at the same time
+            shards.sort(key=lambda shard: shard[0])
+            pages = []
+            for date_range, data in shards:
+                total = min(data["total_count"], SEARCH_LIMIT)
+                pages.append(
+                    [
+                        executor.submit(search, date_range, page)
+                        for page in range(2, math.ceil(total / SEARCH_PER_PAGE) + 1)
+                    ]
+                )
+
+            # Results can move between pages while paging, so drop repeats
+            results = {}
+            for (_, data), futures in zip(shards, pages):
+                for page_data in [data, *(future.result() for future in futures)]:
+                    for item in page_data["items"]:
+                        results.setdefault(item["id"], item)
+
+        return list(results.values())
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """
 Download all the diffs of PRs made during Hacktoberfest
-You can then run `diffstat /tmp/hacktoberfest/*.diff` to get a summary:
+and print a summary like diffstat, with breakdowns by repo and file extension:
     714 files changed, 9843 insertions(+), 13719 deletions(-)
+The diffs are saved to /tmp/hacktoberfest/ unless --no-save is given.
 """
 
 from __future__ import annotations
@@ -10,86 +11,171 @@ from __future__ import annotations
 import argparse
 import datetime
 import os
-import sys
-import time
-from pprint import pprint
-
-import requests
-
-
-def eprint(*args, **kwargs):
-    print(*args, file=sys.stderr, **kwargs)
-
-
-def bleep(url):
-    """Call the API and return JSON and next URL"""
-    # print(url)
-    r = requests.get(url, timeout=10)
-    pprint(r)
-
-    try:
-        next_url = r.links["next"]["url"]
-    except KeyError:
-        next_url = None
-
-    if int(r.headers["X-Ratelimit-Remaining"]) < 12:
-        print("r.status_code", r.status_code)
-        print("X-Ratelimit-Limit", r.headers["X-Ratelimit-Limit"])
-        print("X-Ratelimit-Remaining", r.headers["X-Ratelimit-Remaining"])
-        print("X-RateLimit-Reset", r.headers["X-RateLimit-Reset"])
-        remaining_time = int(r.headers["X-RateLimit-Reset"]) - time.time()
-        print(remaining_time, "seconds")
-        print(remaining_time / 60, "minutes")
-        reset_time = datetime.datetime.fromtimestamp(
-            int(int(r.headers["X-RateLimit-Reset"]))
-        ).strftime("%Y-%m-%d %H:%M:%S")
-        print(reset_time)
-
-    if r.status_code == 200:
-        return r.json(), next_url
-
-    elif r.status_code == 403:
-        if int(r.headers["X-Ratelimit-Remaining"]) == 0:
-            eprint("Rate limit exceeded")
-        sys.exit(403)
-
-    return None, None
-
-
-def get_prs(start_url):
-    issues = []
-
-    # Fetch all issues from GitHub
-    next_url = start_url
-    while True:
-        data, next_url = bleep(next_url)
-        new_issues = data["items"]
-        print("total_count", data["total_count"])
-
-        issues.extend(new_issues)
-
-        for issue in issues:
-            download_diff(issue)
-
-        if not next_url:
-            break
-
-    return issues
-
-
-def download_diff(issue):
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests  # pip install requests
+
+from github_client import GitHubClient
+
+# @@ -start[,count] +start[,count] @@, a count is 1 when left out
+HUNK_HEADER = re.compile(rb"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+
+@dataclass
+class DiffStat:
+    files: int = 0
+    insertions: int = 0
+    deletions: int = 0
+
+    def __iadd__(self, other: DiffStat) -> DiffStat:
+        self.files += other.files
+        self.insertions += other.insertions
+        self.deletions += other.deletions
+        return self
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files changed, "
+            f"{self.insertions} insertions(+), {self.deletions} deletions(-)"
+        )
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split a stream of chunks into lines, keeping any \r"""
+    rest = b""
+    for chunk in chunks:
+        *complete, rest = (rest + chunk).split(b"\n")
+        yield from complete
+    if rest:
+        yield rest
+
+
+def parse_diff(lines: Iterable[bytes]) -> dict[str, DiffStat]:
+    """
+    Count insertions and deletions for each file in a git diff.
+    Hunk headers say how many lines they cover, so content lines
+    starting with "--- " or "+++ " aren't mistaken for file headers.
+    """
+    stats: dict[str, DiffStat] = {}
+    stat = DiffStat()
+    old_left = new_left = 0
+    for line in lines:
+        if old_left > 0 or new_left > 0:
+            if line.startswith(b"+"):
+                stat.insertions += 1
+                new_left -= 1
+            elif line.startswith(b"-"):
+                stat.deletions += 1
+                old_left -= 1
+            elif not line.startswith(b"\\"):  # \ No newline at end of file
+                old_left -= 1
+                new_left -= 1
+        elif match := HUNK_HEADER.match(line):
+            old_left = int(match[1] or 1)
+            new_left = int(match[2] or 1)
+        elif line.startswith(b"diff --git "):
+            # diff --git a/path b/path, binary files have nothing else to go on
+            path = line.rstrip(b"\r").split(b" b/", 1)[-1].decode(errors="replace")
+            stat = stats.setdefault(path, DiffStat(files=1))
+    return stats
+
+
+class Summary:
+    """Running totals of all the diffs, by repo and by file extension"""
+
+    def __init__(self) -> None:
+        self.total = DiffStat()
+        self.repos: defaultdict[str, DiffStat] = defaultdict(DiffStat)
+        self.extensions: defaultdict[str, DiffStat] = defaultdict(DiffStat)
+
+    def add(self, repo: str, stats: dict[str, DiffStat]) -> None:
+        for path, stat in stats.items():
+            extension = os.path.splitext(path)[1] or os.path.basename(path)
+            self.total += stat
+            self.repos[repo] += stat
+            self.extensions[extension] += stat
+
+    def print(self) -> None:
+        for title, breakdown in (
+            ("By repo:", self.repos),
+            ("By extension:", self.extensions),
+        ):
+            print(title)
+            # Most changed first
+            for name, stat in sorted(
+                breakdown.items(),
+                key=lambda item: item[1].insertions + item[1].deletions,
+                reverse=True,
+            ):
+                print(f"{stat}\t{name}")
+            print()
+        print(self.total)
+
+
+def get_prs(client, query, start, end, workers, save=True):
+    # Fetch all issues from GitHub, split by date if there are over 1000
+    issues = client.search_issues(query, start, end, workers)
+    print("total_count", len(issues))
+
+    summary = Summary()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        downloads = [
+            executor.submit(download_diff, client, issue, save) for issue in issues
+        ]
+
+        # Raise any errors, and add up in search order
+        for issue, download in zip(issues, downloads):
+            summary.add(repo_name(issue), download.result())
+
+    return issues, summary
+
+
+def repo_name(issue):
+    org, repo = issue["repository_url"].split("/")[-2:]
+    return f"{org}/{repo}"
+
+
+def download_diff(client, issue, save=True):
     # pprint(issue)
     print("{}\t{}".format(issue["html_url"], issue["title"]))
-    repository_url = issue["repository_url"]
-    org = repository_url.split("/")[-2]
-    repo = repository_url.split("/")[-1]
-    outfile = "{}-{}-{}.diff".format(org, repo, issue["number"])
+    outfile = "{}-{}.diff".format(repo_name(issue).replace("/", "-"), issue["number"])
     outfile = os.path.join("/tmp/hacktoberfest/", outfile)
     # print(outfile)
 
-    cmd = "wget --quiet -nc {} -O {}".format(issue["pull_request"]["diff_url"], outfile)
-    # print(cmd)
-    os.system(cmd)
+    # Like wget -nc, don't download again if we already have it
+    if save and os.path.exists(outfile):
+        with open(outfile, "rb") as f:
+            return parse_diff(iter_lines(f))
+
+    diff_url = issue["pull_request"]["diff_url"]
+    try:
+        with client.get(diff_url, stream=True) as r:
+            chunks = r.iter_content(chunk_size=64 * 1024)
+            if not save:
+                return parse_diff(iter_lines(chunks))
+
+            # Write to a temporary file first so an interrupted download isn't kept
+            with open(outfile + ".tmp", "wb") as f:
+                stats = parse_diff(iter_lines(write_through(chunks, f)))
+    except requests.RequestException as e:
+        # Like wget, report it and carry on with the others
+        print(f"Failed to download {diff_url}: {e}")
+        if os.path.exists(outfile + ".tmp"):
+            os.remove(outfile + ".tmp")
+        return {}
+    os.replace(outfile + ".tmp", outfile)
+    return stats
+
+
+def write_through(chunks, f):
+    """Save each chunk as it goes past"""
+    for chunk in chunks:
+        f.write(chunk)
+        yield chunk
 
 
 def mkdir(directory):
@@ -117,6 +203,19 @@ if __name__ == "__main__":
         choices=("all", "open", "merged", "unmerged"),
         help="Filter by state of PR",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of diffs to download at the same time",
+    )
+    parser.add_argument(
+        "--save",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Save the diffs to /tmp/hacktoberfest/",
+    )
     args = parser.parse_args()
 
     # is:pr author:hugovk created:2017-10-01..2017-10-31 is:open
@@ -125,23 +224,33 @@ if __name__ == "__main__":
 
     # https://developer.github.com/v3/search/#search-issues
 
-    start_url = (
-        "https://api.github.com/search/issues?q=is:pr+author:{author}"
-        "+created:{year}-09-30..{year}-11-01+{type}"
-    )
+    year = int(args.year)
+    query = f"is:pr author:{args.author}"
 
-    pr_type = ""
     if args.type == "open":
-        pr_type = "is:open"
+        query += " is:open"
     elif args.type == "merged":
-        pr_type = "is:closed+is:merged"
+        query += " is:closed is:merged"
     elif args.type == "unmerged":
-        pr_type = "is:closed+is:unmerged"
-
-    mkdir("/tmp/hacktoberfest/")
-    prs = get_prs(start_url.format(author=args.author, type=pr_type, year=args.year))
+        query += " is:closed is:unmerged"
+
+    if args.save:
+        mkdir("/tmp/hacktoberfest/")
+    with GitHubClient(
+        os.environ.get("GITHUB_TOOLS_TOKEN"), pool_size=args.workers
+    ) as client:
+        prs, summary = get_prs(
+            client,
+            query,
+            datetime.date(year, 9, 30),
+            datetime.date(year, 11, 1),
+            args.workers,
+            args.save,
+        )
 
     print_type = "" if args.type == "all" else args.type + " "
     print(f"{len(prs)} total {print_type}PRs")
+    print()
+    summary.print()
 
 # End of file
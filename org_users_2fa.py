@@ -5,16 +5,67 @@ List users in an org with 2FA disabled
 from __future__ import annotations
 
 import argparse
+import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from github import Github  # pip install PyGithub
 from termcolor import cprint  # pip install termcolor
 
+from github_client import GitHubClient
+
 GITHUB_TOKEN = os.environ["GITHUB_TOOLS_REPO_TOKEN"]
 
+API_URL = "https://api.github.com"
+
+# Columns of each summarise tuple
+SUMMARY_HEADER = ["total", "enabled", "% enabled", "disabled", "% disabled"]
+
+
+def logins(client: GitHubClient, url: str) -> set[str]:
+    """Walk the pages, only keeping the logins"""
+    return {user["login"] for page in client.paginate_parallel(url) for user in page}
+
+
+def get_details(client: GitHubClient, login: str) -> tuple[str, str]:
+    user = client.get(f"{API_URL}/users/{login}").json()
+    return user["name"] or "", user["company"] or ""
+
+
+def audit(
+    client: GitHubClient, org: str
+) -> tuple[set[str], set[str], set[str], set[str], dict[str, tuple[str, str]]]:
+    """
+    Get the logins of members and outside collaborators of the org,
+    those with 2FA disabled, and the details of those with 2FA disabled
+    """
+    urls = [
+        f"{API_URL}/orgs/{org}/{kind}?filter={filter_}&per_page=100"
+        for kind in ("members", "outside_collaborators")
+        for filter_ in ("all", "2fa_disabled")
+    ]
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        # Walk all four lists at the same time
+        members, members_disabled, collaborators, collaborators_disabled = executor.map(
+            partial(logins, client), urls
+        )
+
+        # Only the users with 2FA disabled are shown with their names
+        combined_disabled = members_disabled | collaborators_disabled
+        details = dict(
+            zip(
+                combined_disabled,
+                executor.map(partial(get_details, client), combined_disabled),
+            )
+        )
+
+    return members, members_disabled, collaborators, collaborators_disabled, details
+
 
-def summarise(all_: list, disabled: list) -> tuple[int, int, str, int, str]:
+def summarise(
+    all_: set[str], disabled: set[str], details: dict[str, tuple[str, str]]
+) -> tuple[int, int, str, int, str]:
     number = len(all_)
     print()
 
@@ -35,12 +86,10 @@ def summarise(all_: list, disabled: list) -> tuple[int, int, str, int, str]:
     )
     print()
 
-    for user in disabled:
-        print(
-            f"{user.login}"
-            f"\t{user.name if user.name else ''}"
-            f"\t{user.company if user.company else ''}"
-        )
+    # Sort by login
+    for login in sorted(disabled, key=str.lower):
+        name, company = details[login]
+        print(f"{login}\t{name}\t{company}")
     print()
     return (
         number,
@@ -51,47 +100,80 @@ def summarise(all_: list, disabled: list) -> tuple[int, int, str, int, str]:
     )
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description=__doc__,
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-    )
-    parser.add_argument("org", help="GitHub organisation to check")
-    args = parser.parse_args()
-
-    g = Github(GITHUB_TOKEN, per_page=100)
-    org = g.get_organization(args.org)
+def report(org: str, audited: tuple) -> list:
+    """Print the summaries for one org, and return all their results"""
+    members, members_disabled, collaborators, collaborators_disabled, details = audited
     all_results = []
 
+    print()
+    cprint(org, attrs=["bold", "underline"])
     print()
     cprint("MEMBERS", attrs=["bold"])
 
-    members = list(org.get_members())
-    members_disabled = list(org.get_members("2fa_disabled"))
-
-    results = summarise(members, members_disabled)
+    results = summarise(members, members_disabled, details)
     all_results.extend(results)
 
     cprint("COLLABORATORS", attrs=["bold"])
 
-    collaborators = list(org.get_outside_collaborators())
-    collaborators_disabled = list(org.get_outside_collaborators("2fa_disabled"))
-
-    results = summarise(collaborators, collaborators_disabled)
+    results = summarise(collaborators, collaborators_disabled, details)
     all_results.extend(results)
 
     cprint("COMBINED", attrs=["bold"])
 
-    combined = members + collaborators
-    combined_disabled = members_disabled + collaborators_disabled
+    combined = members | collaborators
+    combined_disabled = members_disabled | collaborators_disabled
 
-    # Sort by login
-    combined_disabled = sorted(combined_disabled, key=lambda user: user.login.lower())
-
-    results = summarise(combined, combined_disabled)
+    results = summarise(combined, combined_disabled, details)
     all_results.extend(results)
 
-    print(*all_results, sep="\t")
+    return all_results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("org", nargs="+", help="GitHub organisations to check")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of orgs to check at the same time",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.expanduser("~/.cache/github-tools"),
+        help="Keep pages here and only download them again if changed",
+    )
+    args = parser.parse_args()
+
+    # Only show rate limit waits
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    with (
+        GitHubClient(
+            GITHUB_TOKEN,
+            # Four lists for each org at the same time, with pages for each
+            pool_size=args.workers * 16,
+            cache_dir=args.cache_dir,
+        ) as client,
+        ThreadPoolExecutor(max_workers=args.workers) as executor,
+    ):
+        # Check the orgs at the same time, but print them in order
+        rows = [
+            [org, *report(org, audited)]
+            for org, audited in zip(
+                args.org, executor.map(partial(audit, client), args.org)
+            )
+        ]
+
+    print()
+    sections = ("members", "collaborators", "combined")
+    print("org", *(f"{s} {h}" for s in sections for h in SUMMARY_HEADER), sep="\t")
+    for row in rows:
+        print(*row, sep="\t")
 
 
 if __name__ == "__main__":
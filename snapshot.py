@@ -0,0 +1,142 @@
+"""
+Read and write the issue and PR snapshots saved by download_issues_prs.py
+
+Snapshots are JSON Lines files, optionally gzipped (with a .gz suffix) and
+optionally trimmed to a few fields.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from collections import defaultdict
+from collections.abc import Iterator
+from typing import IO, Any
+
+import numpy as np  # pip install numpy
+
+try:
+    from orjson import loads  # pip install orjson
+except ImportError:
+    from json import loads
+
+# Enough for count_pull_requests.py and time_to_merge.py, plus some basics.
+# Nested fields are dotted, and apply to each item of a list.
+DEFAULT_FIELDS = (
+    "number",
+    "title",
+    "state",
+    "user.login",
+    "labels.name",
+    "created_at",
+    "updated_at",
+    "closed_at",
+    "merged_at",
+    "pull_request.merged_at",
+)
+
+TIMESTAMP_FIELDS = ("created_at", "closed_at", "merged_at")
+
+
+def find_jsonl(filename: str) -> str:
+    """Use the gzipped version of a snapshot if there's no uncompressed one"""
+    if not os.path.exists(filename) and os.path.exists(filename + ".gz"):
+        return filename + ".gz"
+    return filename
+
+
+def open_jsonl(filename: str, mode: str = "r") -> IO[str]:
+    """Open a snapshot as text, compressed or not depending on the suffix"""
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "t", encoding="utf-8")
+    return open(filename, mode, encoding="utf-8")
+
+
+def iter_jsonl(
+    filename: str, fields: list[str] | None = None
+) -> Iterator[dict[str, Any]]:
+    """Yield items from a snapshot one at a time, trimmed to the given fields"""
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rb") as f:
+        for line in f:
+            item = loads(line)
+            yield project(item, fields) if fields else item
+
+
+def load_timestamps(
+    filename: str, fields: tuple[str, ...] = TIMESTAMP_FIELDS
+) -> dict[str, np.ndarray]:
+    """
+    Load timestamp fields from a snapshot as NumPy datetime64 arrays,
+    with NaT for nulls, in the same order as the snapshot.
+
+    They're cached as memory-mapped .npy files in a directory next to the
+    snapshot, and reloaded when the snapshot's modification time or size
+    changes.
+    """
+    cache_dir = filename + ".cache"
+    source_file = os.path.join(cache_dir, "source.json")
+    stat = os.stat(filename)
+    source = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "fields": list(fields),
+    }
+
+    try:
+        with open(source_file, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = None
+
+    if cached != source:
+        columns = {field: [] for field in fields}
+        for item in iter_jsonl(filename, fields=list(fields)):
+            for field in fields:
+                value = item.get(field)
+                # Slice 2022-03-22T08:39:59Z into 2022-03-22T08:39:59,
+                # NumPy doesn't take timezones
+                columns[field].append(value[:-1] if value else "NaT")
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for field, values in columns.items():
+            array = np.array(values, dtype="datetime64[s]")
+            np.save(os.path.join(cache_dir, f"{field}.npy"), array)
+        # Written last, so an interrupted update isn't mistaken for a good one
+        with open(source_file, "w", encoding="utf-8") as f:
+            json.dump(source, f)
+
+    return {
+        field: np.load(os.path.join(cache_dir, f"{field}.npy"), mmap_mode="r")
+        for field in fields
+    }
+
+
+def project(data: dict[str, Any], fields: list[str]) -> dict[str, Any]:
+    """
+    Keep only the given fields, for example:
+    ["number", "user.login"] -> {"number": 123, "user": {"login": "hugovk"}}
+    """
+    subfields = defaultdict(list)
+    for field in fields:
+        key, _, subfield = field.partition(".")
+        subfields[key].append(subfield)
+
+    projected = {}
+    for key, keep in subfields.items():
+        if key not in data:
+            continue
+        value = data[key]
+        if "" in keep:
+            # Keep the whole thing
+            projected[key] = value
+        elif isinstance(value, dict):
+            projected[key] = project(value, keep)
+        elif isinstance(value, list):
+            projected[key] = [
+                project(v, keep) if isinstance(v, dict) else v for v in value
+            ]
+        else:
+            projected[key] = value
+    return projected
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conflicted import get_prs_graphql
+from github_client import GitHubClient
+
+# Two pages of search results, keyed by cursor
+PAGES = {
+    None: {
+        "issueCount": 3,
+        "pageInfo": {"hasNextPage": True, "endCursor": "abc"},
+        "nodes": [
+            {"number": 1, "title": "One", "url": "pr/1", "mergeable": "MERGEABLE"},
+            {"number": 2, "title": "Two", "url": "pr/2", "mergeable": "CONFLICTING"},
+        ],
+    },
+    "abc": {
+        "issueCount": 3,
+        "pageInfo": {"hasNextPage": False, "endCursor": "def"},
+        "nodes": [
+            {"number": 3, "title": "Three", "url": "pr/3", "mergeable": "UNKNOWN"},
+        ],
+    },
+}
+
+
+class GraphQLStandIn(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:
+        length = int(self.headers["Content-Length"])
+        request = json.loads(self.rfile.read(length))
+        assert "search(" in request["query"]
+        assert request["variables"]["query"] == "is:pr author:hugovk is:open"
+
+        page = PAGES[request["variables"]["cursor"]]
+        body = json.dumps({"data": {"search": page}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def graphql_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/graphql"
+    server.shutdown()
+
+
+def test_get_prs_graphql(graphql_url: str) -> None:
+    # Act
+    # Not the API host, so no rate limits apply
+    with GitHubClient() as client:
+        prs, unknown = get_prs_graphql(
+            client, "is:pr author:hugovk is:open", graphql_url
+        )
+
+    # Assert
+    assert [pr["number"] for pr in prs] == [2]
+    assert [pr["number"] for pr in unknown] == [3]
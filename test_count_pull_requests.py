@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from count_pull_requests import iso_year_week, open_per_day
+
+CREATED = np.array(
+    ["2022-03-22T08:39:59", "2022-03-20T23:59:59", "2022-03-23T12:00:00"],
+    dtype="datetime64[s]",
+)
+CLOSED = np.array(
+    ["2022-03-24T10:00:00", "2022-03-22T00:00:00", "NaT"],
+    dtype="datetime64[s]",
+)
+
+
+def test_open_per_day(capsys) -> None:
+    # Act
+    open_per_day(CREATED, CLOSED)
+
+    # Assert
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[:7] == [
+        "2022-03-20, 1",
+        "2022-03-21, 1",
+        "2022-03-22, 2",
+        "2022-03-23, 2",
+        "2022-03-24, 2",
+        "2022-03-25, 1",
+        "2022-03-26, 1",
+    ]
+    # Still open today
+    assert lines[-1].endswith(", 1")
+
+
+@pytest.mark.parametrize(
+    "timestamp, expected",
+    [
+        ("2017-02-10T22:41:57", 201706),
+        # ISO week 1 can start in the previous calendar year
+        ("2018-12-31T00:00:00", 201901),
+        # And the last ISO week can end in the next one
+        ("2021-01-03T23:59:59", 202053),
+        ("2021-01-04T00:00:00", 202101),
+    ],
+)
+def test_iso_year_week(timestamp: str, expected: int) -> None:
+    # Arrange
+    timestamps = np.array([timestamp], dtype="datetime64[s]")
+
+    # Act / Assert
+    assert iso_year_week(timestamps).tolist() == [expected]
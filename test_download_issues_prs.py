@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+import download_issues_prs
+from download_issues_prs import download, download_incremental
+from github_client import GitHubClient
+from snapshot import iter_jsonl
+
+# Newest first, with an issue moved from another repo: a high number, old date
+ITEMS = [
+    {"number": 120, "created_at": "2020-01-05", "updated_at": "2020-02-05"},
+    {"number": 119, "created_at": "2020-01-04", "updated_at": "2020-02-04"},
+    {"number": 90000, "created_at": "2020-01-03", "updated_at": "2020-02-03"},
+    {"number": 118, "created_at": "2020-01-02", "updated_at": "2020-02-02"},
+    {"number": 117, "created_at": "2020-01-01", "updated_at": "2020-02-01"},
+]
+
+
+class ListStandIn(BaseHTTPRequestHandler):
+    items: list[dict] = []
+    # Pages to fail once, like a dropped connection
+    fail_pages: set[int] = set()
+
+    def do_GET(self) -> None:
+        parts = urlparse(self.path)
+        params = parse_qs(parts.query)
+        per_page = int(params["per_page"][0])
+        page = int(params["page"][0]) if "page" in params else 1
+        if page in self.fail_pages:
+            self.fail_pages.discard(page)
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        items = self.items
+        if params.get("sort") == ["updated"]:
+            items = sorted(items, key=lambda item: item["updated_at"], reverse=True)
+        last = max(1, -(-len(items) // per_page))
+
+        body = json.dumps(items[(page - 1) * per_page : page * per_page]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        query = "&".join(f"{k}={v[0]}" for k, v in params.items() if k != "page")
+        url = f"http://{self.headers['Host']}{parts.path}?{query}&page="
+        if page < last:
+            self.send_header(
+                "Link", f'<{url}{page + 1}>; rel="next", <{url}{last}>; rel="last"'
+            )
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def pulls_url(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(download_issues_prs, "PER_PAGE", 2)
+    monkeypatch.setattr(ListStandIn, "items", list(ITEMS))
+    monkeypatch.setattr(ListStandIn, "fail_pages", set())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ListStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/repos/python/cpython/pulls"
+    server.shutdown()
+
+
+def numbers(filename: str) -> list[int]:
+    return [item["number"] for item in iter_jsonl(filename)]
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_download(tmp_path, pulls_url: str, suffix: str) -> None:
+    # Arrange
+    output_file = str(tmp_path / f"pr_list.jsonl{suffix}")
+
+    # Act
+    with GitHubClient() as client:
+        download("PRs", output_file, client, pulls_url, workers=2)
+
+    # Assert
+    assert numbers(output_file) == [120, 119, 90000, 118, 117]
+    assert not os.path.exists(output_file + ".checkpoint")
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_download_resume(tmp_path, pulls_url: str, suffix: str) -> None:
+    # Arrange
+    output_file = str(tmp_path / f"pr_list.jsonl{suffix}")
+    ListStandIn.fail_pages.add(2)
+    with GitHubClient() as client:
+        with pytest.raises(requests.HTTPError):
+            download("PRs", output_file, client, pulls_url, workers=1)
+    assert numbers(output_file) == [120, 119]
+    # A new PR pushes 119 onto the page to resume from
+    ListStandIn.items.insert(0, {"number": 121, "created_at": "2020-01-06"})
+
+    # Act
+    with GitHubClient() as client:
+        download("PRs", output_file, client, pulls_url, workers=1)
+
+    # Assert
+    assert numbers(output_file) == [120, 119, 90000, 118, 117]
+    assert not os.path.exists(output_file + ".checkpoint")
+
+
+def test_download_incremental(tmp_path, pulls_url: str) -> None:
+    # Arrange
+    output_file = str(tmp_path / "pr_list.jsonl")
+    with open(output_file, "w", encoding="utf-8") as f:
+        for item in ITEMS[1:]:
+            f.write(json.dumps(item) + "\n")
+    # Left behind by an earlier full download
+    with open(output_file + ".checkpoint", "w", encoding="utf-8") as f:
+        json.dump({"pages": 1, "size": 10}, f)
+    ListStandIn.items[3] = {**ITEMS[3], "title": "Changed", "updated_at": "2020-03-01"}
+
+    # Act
+    with GitHubClient() as client:
+        download_incremental("PRs", output_file, client, pulls_url, ["number"])
+
+    # Assert
+    assert numbers(output_file) == [90000, 120, 119, 118, 117]
+    assert list(iter_jsonl(output_file))[3] == {"number": 118}
+    assert not os.path.exists(output_file + ".checkpoint")
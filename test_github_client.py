@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import datetime
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import github_client
+from github_client import GitHubClient, RateLimit
+
+# Three issues a day for January
+ISSUES = [
+    {"id": day * 10 + i, "created_at": f"2020-01-{day:02}"}
+    for day in range(1, 32)
+    for i in range(3)
+]
+
+
+class SearchStandIn(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        params = parse_qs(urlparse(self.path).query)
+        start, end = re.search(r"created:(\S+)\.\.(\S+)", params["q"][0]).groups()
+        per_page = int(params["per_page"][0])
+        page = int(params["page"][0])
+
+        found = [issue for issue in ISSUES if start <= issue["created_at"] <= end]
+        # Only the first few, like the real thing only gives the first 1000
+        items = found[: github_client.SEARCH_LIMIT][
+            (page - 1) * per_page : page * per_page
+        ]
+        body = json.dumps({"total_count": len(found), "items": items}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+# Ten repos, three to a page
+REPOS = [{"id": i} for i in range(10)]
+
+
+class ReposStandIn(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        parts = urlparse(self.path)
+        params = parse_qs(parts.query)
+        per_page = int(params["per_page"][0])
+        page = int(params.get("page", ["1"])[0])
+        last = -(-len(REPOS) // per_page)
+
+        body = json.dumps(REPOS[(page - 1) * per_page : page * per_page]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        url = f"http://{self.headers['Host']}{parts.path}?per_page={per_page}"
+        if "cursor" in params:
+            # Like cursor pagination, with no last link
+            url += "&cursor=1"
+        url += "&page="
+        if page < last:
+            link = f'<{url}{page + 1}>; rel="next"'
+            if "cursor" not in params:
+                link += f', <{url}{last}>; rel="last"'
+            self.send_header("Link", link)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class ETagStandIn(BaseHTTPRequestHandler):
+    # Bumped by the test to change the content
+    version = 1
+    full_responses = 0
+
+    def do_GET(self) -> None:
+        etag = f'"v{self.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        ETagStandIn.full_responses += 1
+        body = json.dumps({"version": self.version}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Link", '<http://example.com/?page=2>; rel="next"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def serve(handler: type[BaseHTTPRequestHandler]):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def repos_url():
+    server = serve(ReposStandIn)
+    yield f"http://127.0.0.1:{server.server_port}/users/hugovk/repos?per_page=3"
+    server.shutdown()
+
+
+@pytest.fixture
+def search_url(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(github_client, "SEARCH_LIMIT", 10)
+    monkeypatch.setattr(github_client, "SEARCH_PER_PAGE", 4)
+    server = serve(SearchStandIn)
+    yield f"http://127.0.0.1:{server.server_port}/search/issues"
+    server.shutdown()
+
+
+def test_search_issues(search_url: str) -> None:
+    # Act
+    with GitHubClient() as client:
+        issues = client.search_issues(
+            "is:pr",
+            datetime.date(2020, 1, 1),
+            datetime.date(2020, 1, 31),
+            url=search_url,
+        )
+
+    # Assert
+    assert issues == ISSUES
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("query", ["", "&cursor=1"])
+def test_paginate_parallel(repos_url: str, workers: int, query: str) -> None:
+    # Act
+    with GitHubClient() as client:
+        pages = list(client.paginate_parallel(repos_url + query, workers))
+
+    # Assert
+    assert pages == [REPOS[0:3], REPOS[3:6], REPOS[6:9], REPOS[9:10]]
+
+
+def test_etag_cache(tmp_path) -> None:
+    # Arrange
+    server = serve(ETagStandIn)
+    url = f"http://127.0.0.1:{server.server_port}/orgs/python/members"
+
+    # Act
+    with GitHubClient(cache_dir=str(tmp_path)) as client:
+        first = client.get(url)
+        second = client.get(url)
+        ETagStandIn.version = 2
+        third = client.get(url)
+    server.shutdown()
+
+    # Assert
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == {"version": 1}
+    assert second.links["next"]["url"] == "http://example.com/?page=2"
+    assert third.json() == {"version": 2}
+    assert ETagStandIn.full_responses == 2
+
+
+@pytest.mark.parametrize(
+    "remaining, limit, slept",
+    [
+        # Unauthenticated core and authenticated search have small limits
+        ("5", "60", False),
+        ("1", "30", False),
+        ("0", "30", True),
+    ],
+)
+def test_rate_limit_wait(
+    monkeypatch: pytest.MonkeyPatch, remaining: str, limit: str, slept: bool
+) -> None:
+    # Arrange
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    rate_limit = RateLimit()
+    rate_limit.update(
+        {
+            "X-RateLimit-Remaining": remaining,
+            "X-RateLimit-Limit": limit,
+            "X-RateLimit-Reset": str(int(time.time()) + 60),
+        }
+    )
+
+    # Act
+    rate_limit.wait()
+
+    # Assert
+    assert bool(sleeps) == slept
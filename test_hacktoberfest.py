@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from github_client import GitHubClient
+from hacktoberfest import DiffStat, download_diff, iter_lines, parse_diff
+
+DIFF = b"""\
+diff --git a/README.md b/README.md
+index 1111111..2222222 100644
+--- a/README.md
++++ b/README.md
+@@ -1,3 +1,3 @@
+ keep
+--- old dashes
++++ new plusses
+ keep
+diff --git a/setup.py b/setup.py
+new file mode 100644
+--- /dev/null
++++ b/setup.py
+@@ -0,0 +1,2 @@
++import x
++print(x)
+\\ No newline at end of file
+diff --git a/logo.png b/logo.png
+index 3333333..4444444 100644
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+def test_parse_diff() -> None:
+    # Act
+    stats = parse_diff(iter_lines([DIFF]))
+
+    # Assert
+    assert stats == {
+        "README.md": DiffStat(files=1, insertions=1, deletions=1),
+        "setup.py": DiffStat(files=1, insertions=2, deletions=0),
+        "logo.png": DiffStat(files=1, insertions=0, deletions=0),
+    }
+
+
+@pytest.mark.parametrize("size", [1, 7, 1024])
+def test_iter_lines_chunked(size: int) -> None:
+    # Arrange
+    chunks = [DIFF[i : i + size] for i in range(0, len(DIFF), size)]
+
+    # Act
+    lines = list(iter_lines(chunks))
+
+    # Assert
+    assert lines == DIFF.splitlines()
+
+
+class DiffStandIn(BaseHTTPRequestHandler):
+    rate_limited = False
+
+    def do_GET(self) -> None:
+        if self.path == "/missing.diff":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if not DiffStandIn.rate_limited:
+            # Once, then let it through
+            DiffStandIn.rate_limited = True
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(DIFF)))
+        self.end_headers()
+        self.wfile.write(DIFF)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def diff_server_url(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(DiffStandIn, "rate_limited", False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DiffStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.parametrize("name, files", [("missing", 0), ("pr", 3)])
+def test_download_diff(diff_server_url: str, name: str, files: int) -> None:
+    # Arrange
+    issue = {
+        "html_url": f"{diff_server_url}/{name}",
+        "title": "Title",
+        "number": 1,
+        "repository_url": "https://api.github.com/repos/org/repo",
+        "pull_request": {"diff_url": f"{diff_server_url}/{name}.diff"},
+    }
+
+    # Act
+    with GitHubClient(pool_size=1) as client:
+        stats = download_diff(client, issue, save=False)
+
+    # Assert
+    assert len(stats) == files
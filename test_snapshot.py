@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+import numpy as np
+
+from snapshot import find_jsonl, iter_jsonl, load_timestamps, project
+
+PR = {
+    "number": 123,
+    "user": {"login": "hugovk", "id": 1324225},
+    "labels": [{"name": "skip news", "id": 1}, {"name": "docs", "id": 2}],
+    "created_at": "2022-03-22T08:39:59Z",
+    "closed_at": None,
+}
+
+
+def test_project() -> None:
+    # Act
+    projected = project(PR, ["number", "user.login", "labels.name", "missing"])
+
+    # Assert
+    assert projected == {
+        "number": 123,
+        "user": {"login": "hugovk"},
+        "labels": [{"name": "skip news"}, {"name": "docs"}],
+    }
+
+
+def test_iter_jsonl_gzip(tmp_path) -> None:
+    # Arrange
+    filename = str(tmp_path / "pr_list.jsonl")
+    # Two gzip members, like a download appending a page at a time
+    for number in (2, 1):
+        with gzip.open(filename + ".gz", "at", encoding="utf-8") as f:
+            f.write(json.dumps({**PR, "number": number}) + "\n")
+
+    # Act
+    items = list(iter_jsonl(find_jsonl(filename), ["number"]))
+
+    # Assert
+    assert items == [{"number": 2}, {"number": 1}]
+
+
+def test_load_timestamps(tmp_path) -> None:
+    # Arrange
+    filename = str(tmp_path / "pr_list.jsonl")
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(json.dumps(PR) + "\n")
+
+    # Act
+    first = load_timestamps(filename, ("created_at", "closed_at"))
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(json.dumps({**PR, "closed_at": "2022-03-23T00:00:00Z"}) + "\n")
+    second = load_timestamps(filename, ("created_at", "closed_at"))
+
+    # Assert
+    assert first["created_at"].tolist() == [np.datetime64("2022-03-22T08:39:59")]
+    assert np.isnat(first["closed_at"]).all()
+    # Reloaded because the snapshot changed
+    assert len(second["created_at"]) == 2
+    assert second["closed_at"][1] == np.datetime64("2022-03-23T00:00:00")
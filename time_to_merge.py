@@ -5,33 +5,94 @@ find time from open to merge in days
 
 from __future__ import annotations
 
+import argparse
 import datetime as dt
 
-import jsonlines  # pip install jsonlines
+import numpy as np  # pip install numpy
+
+from count_pull_requests import iso_year_week
+from snapshot import find_jsonl, load_timestamps
 
 try:
     from rich import print
 except ImportError:
     pass
 
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def each_pr(created: np.ndarray, merged: np.ndarray) -> None:
+    """
+    Time to merge for each merged PR
+    """
+    today = np.datetime64(dt.datetime.today(), "s")
+    one_day = np.timedelta64(1, "D")
+    days_to_merge = (merged - created) // one_day
+    days_since_created = (today - created) // one_day
+
+    print("created_at, merged_at, days to merge, days since created")
+    for row in zip(
+        # 2021-08-10T16:51:08Z
+        np.datetime_as_string(created),
+        np.datetime_as_string(merged),
+        days_to_merge,
+        days_since_created,
+    ):
+        print(f"{row[0]}Z, {row[1]}Z, {row[2]}, {row[3]}")
 
-with jsonlines.open("pr_list.jsonl") as reader:
-    pull_requests = list(reader)
-# print(f"Total PRs: {len(pull_requests):,}")
 
-today = dt.datetime.today()
+def per_period(created: np.ndarray, merged: np.ndarray, period: str) -> None:
+    """
+    Median, 90th and 99th percentile time to merge
+    for PRs merged in each week or month
+    """
+    days_to_merge = (merged - created) / np.timedelta64(1, "D")
+    if period == "week":
+        keys = iso_year_week(merged)
+    else:
+        keys = merged.astype("datetime64[M]")
+
+    # Sort by period, then each period's PRs are a contiguous slice
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    days_to_merge = days_to_merge[order]
+    periods, starts, counts = np.unique(keys, return_index=True, return_counts=True)
 
-print("created_at, merged_at, days to merge, days since created")
-for pr in reversed(pull_requests):
-    if not pr["merged_at"]:
-        continue
-    # 2021-08-10T16:51:08Z
-    timestamp_format = "%Y-%m-%dT%H:%M:%SZ"
-    created_at = dt.datetime.strptime(pr["created_at"], timestamp_format)
-    merged_at = dt.datetime.strptime(pr["merged_at"], timestamp_format)
     print(
-        f'{pr["created_at"]}, '
-        f'{pr["merged_at"]}, '
-        f"{(merged_at - created_at).days}, "
-        f"{(today - created_at).days}"
+        f"{period.capitalize()}, PRs merged, "
+        + ", ".join(f"p{q * 100:g} days to merge" for q in QUANTILES)
     )
+    for key, start, count in zip(periods, starts, counts):
+        quantiles = np.quantile(days_to_merge[start : start + count], QUANTILES)
+        # 2017 w06 or 2017-02
+        label = f"{key // 100} w{key % 100:02}" if period == "week" else str(key)
+        print(f"{label}, {count}, " + ", ".join(f"{q:.1f}" for q in quantiles))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--per",
+        choices=("week", "month"),
+        help="Summarise time to merge per week or month merged, "
+        "instead of listing each PR",
+    )
+    args = parser.parse_args()
+
+    timestamps = load_timestamps(find_jsonl("pr_list.jsonl"))
+    is_merged = ~np.isnat(timestamps["merged_at"])
+    # Oldest first
+    created = timestamps["created_at"][is_merged][::-1]
+    merged = timestamps["merged_at"][is_merged][::-1]
+    # print(f"Total PRs: {len(timestamps['created_at']):,}")
+
+    if args.per:
+        per_period(created, merged, args.per)
+    else:
+        each_pr(created, merged)
+
+
+if __name__ == "__main__":
+    main()